@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from collections.abc import Callable
+
+import frappe
+import httpx
+import orjson
+
+from patent_hub.api._http import get_async_http
+from patent_hub.api._pipeline_runner import (
+	JSON_HEADERS,
+	acquire_chain_token,
+	apply_output,
+	get_invoke_url,
+	mark_failed,
+)
+
+logger = frappe.logger("app_patent_hub")
+logger.setLevel(logging.INFO)
+
+BATCH_SIZE = 8
+# 单个 drain 任务最多处理的批次数，剩余的交给下一次调度
+MAX_ROUNDS = 4
+
+
+def enqueue_drain(doctype: str, job_method: str, timeout: int):
+	"""有排队中的文档时，入队一个去重的 drain 任务；由 run() 与 cron 调用"""
+	if not frappe.db.exists(doctype, {"is_running": 1, "is_done": 0}):
+		return
+	frappe.enqueue(
+		job_method,
+		queue="long",
+		timeout=timeout * MAX_ROUNDS,
+		job_id=job_method,
+		deduplicate=True,
+		# 与 run() 置 is_running 的写入同一事务提交后再入队
+		enqueue_after_commit=True,
+	)
+
+
+def drain_and_dispatch(
+	doctype: str,
+	endpoint_field: str,
+	payload_builder: Callable[[object, str], dict],
+	done_event: str,
+	failed_event: str,
+	timeout: int,
+	content_hasher: Callable[[object], str] | None = None,
+	batch_size: int = BATCH_SIZE,
+):
+	"""
+	取出排队中的文档（is_running=1, is_done=0），每批最多 batch_size 个，
+	在共享 AsyncClient 上 asyncio.gather 并发调用远端 chain，再逐个回写
+	"""
+	seen = set()
+	for _ in range(MAX_ROUNDS):
+		filters = {"is_running": 1, "is_done": 0}
+		if seen:
+			filters["name"] = ["not in", list(seen)]
+		# 提交任务的用户（run() 置 is_running 时写入 modified_by），失败事件只推送给该用户
+		rows = frappe.get_all(
+			doctype,
+			filters=filters,
+			fields=["name", "modified_by"],
+			order_by="modified asc",
+			limit=batch_size,
+		)
+		if not rows:
+			return
+		seen.update(row.name for row in rows)
+		logger.info("批量处理 %s: %s", doctype, [row.name for row in rows])
+		try:
+			url, server_work_dir = get_invoke_url(endpoint_field)
+		except Exception as e:
+			for row in rows:
+				mark_failed(doctype, row.name, e, failed_event, row.modified_by)
+			return
+		# 构建 payload
+		jobs = []
+		for row in rows:
+			name, user = row.name, row.modified_by
+			try:
+				doc = frappe.get_doc(doctype, name)
+			except frappe.DoesNotExistError:
+				# get_all 之后文档已被删除，跳过即可，不影响本批其余文档
+				logger.warning(f"文档 {name} 不存在，跳过任务")
+				continue
+			try:
+				content_hash = content_hasher(doc) if content_hasher else None
+				jobs.append((doc, content_hash, user, payload_builder(doc, server_work_dir)))
+			except Exception as e:
+				mark_failed(doctype, name, e, failed_event, user)
+		if not jobs:
+			continue
+
+		# 按令牌桶放行，桶内令牌不足时在发出前等待（逐个取，批次大于桶容量时也不会卡死）
+		for _ in jobs:
+			acquire_chain_token()
+
+		loop, async_http = get_async_http()
+
+		async def call_chain():
+			return await asyncio.gather(
+				*[
+					async_http.post(url, content=orjson.dumps(payload), headers=JSON_HEADERS, timeout=timeout)
+					for *_, payload in jobs
+				],
+				return_exceptions=True,
+			)
+
+		results = loop.run_until_complete(call_chain())
+		# 按顺序回写各文档
+		# drain 任务去重后以最先调用 run() 的用户（或 cron 的 Administrator）运行，
+		# 回写时切换为各文档的提交用户，权限校验与 modified_by / Version 记录才归属正确
+		job_user = frappe.session.user
+		for (doc, content_hash, user, _), res in zip(jobs, results, strict=True):
+			try:
+				frappe.set_user(user or job_user)
+				if isinstance(res, BaseException):
+					raise res
+				apply_output(doc, res, content_hash)
+				frappe.publish_realtime(done_event, {"docname": doc.name}, user=user, after_commit=True)
+				frappe.db.commit()
+			except Exception as e:
+				mark_failed(
+					doctype, doc.name, e, failed_event, user, timed_out=isinstance(e, httpx.TimeoutException)
+				)
+			finally:
+				frappe.set_user(job_user)
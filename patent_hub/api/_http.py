@@ -0,0 +1,29 @@
+import asyncio
+import atexit
+
+import httpx
+
+# 进程级共享的 HTTP 客户端：调用远端 chain 的流程复用同一个连接池（keep-alive）
+LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+HTTP = httpx.Client(limits=LIMITS)
+
+# 批量并发调用使用的异步客户端与事件循环：只有 RQ 的批量 drain 用到，首次调用时才创建，
+# web worker 导入本模块时不会建出用不到的事件循环
+_ASYNC: tuple[asyncio.AbstractEventLoop, httpx.AsyncClient] | None = None
+
+
+def get_async_http() -> tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]:
+	"""返回 (事件循环, AsyncClient)；客户端始终在同一个事件循环上运行"""
+	global _ASYNC
+	if _ASYNC is None:
+		_ASYNC = (asyncio.new_event_loop(), httpx.AsyncClient(limits=LIMITS))
+	return _ASYNC
+
+
+@atexit.register
+def _close():
+	HTTP.close()
+	if _ASYNC is not None:
+		loop, client = _ASYNC
+		loop.run_until_complete(client.aclose())
+		loop.close()
@@ -0,0 +1,92 @@
+import frappe
+from frappe import _
+from frappe.model.naming import make_autoname, parse_naming_series
+
+# 数据导入时每次向 tabSeries 预留的序号个数
+# 命名多为按天计数的 .##，预留过多会在导入结束后留下大段空号并挤占两位宽度
+BULK_SERIES_BATCH = 20
+
+# 参与命名的用户输入最多取前 128 个字符
+_MAX_NAME_LEN = 128
+
+
+def _build_name_table(keep_dash: bool) -> dict[int, str | None]:
+	"""ASCII 字符的 str.translate 表：空白（及连字符）替换为 _，其余标点删除"""
+	table = {}
+	for i in range(128):
+		c = chr(i)
+		if c.isalnum() or c == "_" or (keep_dash and c == "-"):
+			continue
+		table[i] = "_" if c.isspace() or c == "-" else None
+	return table
+
+
+_NAME_TABLE = _build_name_table(keep_dash=False)
+_NAME_TABLE_KEEP_DASH = _build_name_table(keep_dash=True)
+
+
+def safe_name(text: str, keep_dash: bool = False) -> str:
+	"""
+	把用户输入的名称清洗为可用于命名的片段：保留字母、数字（含中文）与 _，
+	空白替换为 _，连字符按 keep_dash 保留或替换为 _，其余字符删除
+	"""
+	text = (text or "")[:_MAX_NAME_LEN]
+	if text.isascii():
+		return text.translate(_NAME_TABLE_KEEP_DASH if keep_dash else _NAME_TABLE)
+	# 含非 ASCII 字符时逐字符判断，仍是单次线性扫描
+	return "".join(
+		c if c.isalnum() or c == "_" or (keep_dash and c == "-") else "_" if c.isspace() or c == "-" else ""
+		for c in text
+	)
+
+
+def patent_id_name(patent_id: str) -> str:
+	"""取 patent_id（PAT-{名称}-##）中的名称段，格式不符时报错"""
+	_prefix, _sep, rest = patent_id.partition("-")
+	name = rest.partition("-")[0]
+	if not name:
+		frappe.throw(_("Invalid patent_id format"))
+	return name
+
+
+def _reserve(prefix: str, n: int) -> int:
+	"""一次性把 tabSeries 中 prefix 的计数器推进 n，返回预留区间的第一个序号"""
+	current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name`=%s FOR UPDATE", (prefix,))
+	if current and current[0][0] is not None:
+		current = current[0][0]
+		frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name`=%s", (n, prefix))
+	else:
+		current = 0
+		frappe.db.sql("INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (prefix, n))
+	return current + 1
+
+
+def _drop_pool(prefix: str):
+	"""事务回滚后丢弃该前缀的预留池：tabSeries 的 UPDATE 已随之撤销，池中序号不再归本进程所有"""
+	getattr(frappe.local, "series_pool", {}).pop(prefix, None)
+
+
+def _pooled_number(prefix: str, digits: int) -> str:
+	"""从本线程的预留池取下一个序号，池空时再向 tabSeries 预留 BULK_SERIES_BATCH 个"""
+	if not hasattr(frappe.local, "series_pool"):
+		frappe.local.series_pool = {}
+	pool = frappe.local.series_pool.get(prefix)
+	if not pool or pool[0] >= pool[1]:
+		start = _reserve(prefix, BULK_SERIES_BATCH)
+		pool = frappe.local.series_pool[prefix] = [start, start + BULK_SERIES_BATCH]
+		# 预留与本行数据同一事务：提交后池一直有效（提交会清空回滚回调），回滚则一并作废
+		frappe.db.after_rollback.add(lambda: _drop_pool(prefix))
+	number = pool[0]
+	pool[0] += 1
+	return f"{number:0{digits}d}"
+
+
+def next_name(series: str) -> str:
+	"""
+	controller 中替代 make_autoname：
+	平时逐个取号；数据导入（frappe.flags.in_import）时从预留池取号，未用完的序号会留下空号
+	只用于各行共用的序列（如按天计数、按当前用户计数），按行内容区分的序列池化没有收益
+	"""
+	if not frappe.flags.in_import:
+		return make_autoname(series)
+	return parse_naming_series(series, number_generator=_pooled_number)
@@ -0,0 +1,280 @@
+import logging
+import re
+from collections import namedtuple
+from collections.abc import Callable
+
+import frappe
+import httpx
+import orjson
+from frappe import enqueue
+from frappe.utils import now_datetime
+from frappe.utils.caching import site_cache
+
+from patent_hub.api._http import HTTP
+from patent_hub.api._ratelimit import CHAIN_BUCKET
+
+logger = frappe.logger("app_patent_hub")
+logger.setLevel(logging.INFO)
+
+# API Endpoint 中 run_* 流程所需的配置（server_work_dir 已解密）
+ApiEndpointConfig = namedtuple(
+	"ApiEndpointConfig",
+	[
+		"base_url",
+		"server_work_dir",
+		"md_to_docx",
+		"scene_to_tech",
+		"tech_to_claims",
+		"claims_to_docx",
+		"review_to_revise",
+		"chain_rate_capacity",
+		"chain_rate_per_sec",
+	],
+)
+
+# 请求体由 orjson 序列化后以 content 发送，需自行声明类型
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# mark_failed 直接写入 File List 子表时的列
+_FILE_LIST_FIELDS = (
+	"name",
+	"parent",
+	"parenttype",
+	"parentfield",
+	"idx",
+	"s3_url",
+	"owner",
+	"modified_by",
+	"creation",
+	"modified",
+)
+
+# markdown 一级标题
+_TITLE_RE = re.compile(r"^#\s*(.+)", re.MULTILINE)
+# 去除标点，保留连字符、中文、字母、数字
+_SANITIZE_RE = re.compile(r"[^\w\u4e00-\u9fa5\-]")
+
+
+def markdown_title(markdown_text: str, default: str = "tmp") -> str:
+	"""提取 markdown 的一级标题，没有则返回 default"""
+	_match = _TITLE_RE.search(markdown_text)
+	return _match.group(1).strip() if _match else default
+
+
+def make_tmp_folder(server_work_dir: str, title: str, subdir: str) -> str:
+	"""拼接远端工作目录：{server_work_dir}/{title}/{subdir}"""
+	# 远端固定为 POSIX 路径，直接拼接即可，不必经过 os.path.join
+	return f"{server_work_dir.rstrip('/')}/{_SANITIZE_RE.sub('', title)}/{subdir}"
+
+
+def start(
+	doctype: str,
+	docname: str,
+	job_method: str | None,
+	timeout: int,
+	required: tuple[str, str] | None = None,
+	content_hasher: Callable[[object], str] | None = None,
+) -> dict:
+	"""
+	whitelist run() 的通用实现：校验状态，置 is_running 并入队
+	job_method 为 None 时只置 is_running，由调用方自行调度（如批量 drain）
+	required: (字段名, 为空时的错误提示)
+	content_hasher(doc) -> hash：已完成的文档内容未变时直接沿用上次结果，内容变化时允许重新运行
+	"""
+	try:
+		logger.info(f"开始处理文档：{docname}")
+		try:
+			doc = frappe.get_doc(doctype, docname)
+		except frappe.DoesNotExistError:
+			return {"success": False, "error": f"文档 {docname} 不存在"}
+		if required and not doc.get(required[0]):
+			return {"success": False, "error": required[1]}
+		if doc.is_running:
+			return {"success": False, "error": "任务正在运行中，请等待完成"}
+		if doc.is_done:
+			if not content_hasher:
+				return {"success": False, "error": "任务已完成，不可重复运行"}
+			if doc.content_hash == content_hasher(doc) and doc.generated_files:
+				logger.info(f"内容未变化，沿用上次结果: {docname}")
+				return {"success": True, "unchanged": True, "message": "内容未变化，沿用上次结果"}
+		# 只翻转一个标志位，绕过 doc.save() 的 validate / 版本记录等流程（权限仍需校验）
+		doc.check_permission("write")
+		# 批量 drain 依赖 modified / modified_by 排序并识别提交用户，此时才更新 modified
+		# 内容变化后重新运行的文档同时清除 is_done，drain 才会取到
+		frappe.db.set_value(
+			doctype, docname, {"is_running": 1, "is_done": 0}, update_modified=job_method is None
+		)
+		if job_method:
+			# 随请求结束时的自动提交一并生效，提交后再入队，任务必然能读到 is_running
+			enqueue(
+				job_method,
+				queue="long",
+				timeout=timeout,
+				enqueue_after_commit=True,
+				docname=docname,
+				user=frappe.session.user,
+			)
+		return {"success": True, "message": "任务已成功提交"}
+	except Exception as e:
+		logger.error(f"启动任务失败: {e}")
+		logger.error(frappe.get_traceback())
+		return {"success": False, "error": f"启动任务失败: {e}"}
+
+
+@site_cache(ttl=300, maxsize=1)
+def get_api_endpoint_config() -> ApiEndpointConfig:
+	"""读取 API Endpoint 并缓存 5 分钟，避免每个任务都查库 + 解密 server_work_dir"""
+	api_endpoint = frappe.get_single("API Endpoint")
+	server_work_dir = api_endpoint.get_password("server_work_dir", raise_exception=False)
+	# 缺少必需字段时在此报错，不把空配置缓存下来
+	if not (api_endpoint.server_ip_port and server_work_dir):
+		frappe.throw("未配置 API Endpoint")
+	return ApiEndpointConfig(
+		base_url=api_endpoint.server_ip_port.rstrip("/"),
+		server_work_dir=server_work_dir,
+		md_to_docx=api_endpoint.md_to_docx,
+		scene_to_tech=api_endpoint.scene_to_tech,
+		tech_to_claims=api_endpoint.tech_to_claims,
+		claims_to_docx=api_endpoint.claims_to_docx,
+		review_to_revise=api_endpoint.review_to_revise,
+		chain_rate_capacity=api_endpoint.chain_rate_capacity,
+		chain_rate_per_sec=api_endpoint.chain_rate_per_sec,
+	)
+
+
+def clear_api_endpoint_config(doc=None, method=None):
+	"""doc_events：API Endpoint 保存后清除缓存"""
+	get_api_endpoint_config.clear_cache()
+
+
+def get_invoke_url(endpoint_field: str) -> tuple[str, str]:
+	"""返回 (invoke URL, server_work_dir)"""
+	config = get_api_endpoint_config()
+	app_name = getattr(config, endpoint_field).strip("/")
+	url = f"{config.base_url}/{app_name}/invoke"
+	logger.info("请求 URL：%s", url)
+	return url, config.server_work_dir
+
+
+def acquire_chain_token():
+	"""按 API Endpoint 配置的容量 / 速率，从所有 worker 共用的令牌桶取一个调用远端 chain 的令牌"""
+	config = get_api_endpoint_config()
+	CHAIN_BUCKET.acquire(config.chain_rate_capacity, config.chain_rate_per_sec)
+
+
+def apply_output(doc, res, content_hash: str | None = None):
+	"""解析 chain 响应，回写 time_s / cost / generated_files 并置为完成（不提交）"""
+	res.raise_for_status()
+	res_json = orjson.loads(res.content)
+	# output
+	output = orjson.loads(res_json["output"])
+	# output 可能很大：完整内容只在 DEBUG 下输出，且惰性格式化
+	if logger.isEnabledFor(logging.DEBUG):
+		logger.debug("解析后的 JSON: %s", output)
+	doc.time_s = output.get("TIME(s)", 0.0)
+	doc.cost = output.get("cost", 0)
+	# s3_urls
+	s3_urls = output.get("generated_files", [])
+	logger.info("S3 URL：%s", s3_urls)
+	doc.set("generated_files", [{"s3_url": u} for u in s3_urls])
+	if content_hash:
+		doc.content_hash = content_hash
+	doc.is_done = 1
+	doc.is_running = 0
+	doc.flags.ignore_version = True
+	doc.save()
+
+
+def mark_failed(
+	doctype: str,
+	docname: str,
+	error: Exception,
+	failed_event: str,
+	user: str | None = None,
+	timed_out: bool = False,
+):
+	"""
+	把错误写入 generated_files，复位运行状态并推送失败事件
+	timed_out: 远端请求超时，失败事件中带上该标记，前端可提示直接重试
+	"""
+	logger.error(f"任务 {docname} 执行失败: {error!s}")
+	logger.error(frappe.get_traceback())
+	try:
+		# error_msg
+		error_msg = f"超时: 远端服务未在限定时间内响应（{error!s}）" if timed_out else f"失败: {error!s}"
+		short_error_msg = (error_msg[:132] + "...") if len(error_msg) > 135 else error_msg
+		# 直接替换 generated_files 子表行，避免 reload + doc.save() 的子表比对
+		frappe.db.delete(
+			"File List", {"parent": docname, "parenttype": doctype, "parentfield": "generated_files"}
+		)
+		now, session_user = now_datetime(), frappe.session.user
+		frappe.db.bulk_insert(
+			"File List",
+			_FILE_LIST_FIELDS,
+			[
+				(
+					frappe.generate_hash(length=10),
+					docname,
+					doctype,
+					"generated_files",
+					1,
+					short_error_msg,
+					session_user,
+					session_user,
+					now,
+					now,
+				)
+			],
+		)
+		# 重置运行状态
+		frappe.db.set_value(doctype, docname, {"is_done": 0, "is_running": 0})
+		frappe.publish_realtime(
+			failed_event,
+			{"error": str(error), "docname": docname, "timed_out": timed_out},
+			user=user,
+			after_commit=True,
+		)
+		frappe.db.commit()
+	except Exception as save_error:
+		logger.error(f"保存失败状态时出错: {save_error!s}")
+
+
+def run_pipeline(
+	doctype: str,
+	docname: str,
+	endpoint_field: str,
+	payload_builder: Callable[[object, str], dict],
+	done_event: str,
+	failed_event: str,
+	timeout: int,
+	user: str | None = None,
+	content_hasher: Callable[[object], str] | None = None,
+):
+	"""
+	队列任务的通用实现：调用远端 chain 并回写 time_s / cost / generated_files
+	payload_builder(doc, server_work_dir) -> payload
+	timeout: 远端请求超时，应小于入队时的任务超时，留出回写状态的时间
+	content_hasher(doc) -> hash：成功后写入 doc.content_hash，供 start() 判断内容是否变化
+	"""
+	logger.info(f"进入 job: {docname}")
+	try:
+		doc = frappe.get_doc(doctype, docname)
+	except frappe.DoesNotExistError:
+		# 入队后文档已被删除，无需回写状态
+		logger.warning(f"文档 {docname} 不存在，跳过任务")
+		return
+	try:
+		content_hash = content_hasher(doc) if content_hasher else None
+		# 请求 URL
+		url, server_work_dir = get_invoke_url(endpoint_field)
+		# payload
+		payload = payload_builder(doc, server_work_dir)
+		acquire_chain_token()
+		res = HTTP.post(url, content=orjson.dumps(payload), headers=JSON_HEADERS, timeout=timeout)
+		apply_output(doc, res, content_hash)
+		frappe.publish_realtime(done_event, {"docname": doc.name}, user=user, after_commit=True)
+		frappe.db.commit()
+	except httpx.TimeoutException as e:
+		mark_failed(doctype, docname, e, failed_event, user, timed_out=True)
+	except Exception as e:
+		mark_failed(doctype, docname, e, failed_event, user)
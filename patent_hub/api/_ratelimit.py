@@ -0,0 +1,81 @@
+import functools
+import logging
+import time
+
+import frappe
+
+logger = frappe.logger("app_patent_hub")
+logger.setLevel(logging.INFO)
+
+# 令牌桶：状态存于 Redis 哈希（tokens, ts），所有 worker 进程共用一个桶，一次往返原子完成
+# KEYS[1]=桶键；ARGV=[capacity, refill_per_sec, now_ms, tokens]
+# 取到令牌返回 0，否则返回还需等待的毫秒数（不扣减）
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= requested then
+	tokens = tokens - requested
+else
+	wait = math.ceil((requested - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+@functools.cache
+def _get_script():
+	"""注册 Lua 脚本（调用时走 EVALSHA，脚本缓存丢失时自动重新加载）"""
+	return frappe.cache().register_script(_TOKEN_BUCKET_LUA)
+
+
+class TokenBucket:
+	"""
+	基于 Redis 的令牌桶：RQ worker 每个任务都在新的子进程中运行，
+	进程内的计数无法跨任务生效，桶的状态因此放在 Redis 中按站点共享
+	"""
+
+	def __init__(self, name: str):
+		self.name = name
+
+	def acquire(
+		self, capacity: int, refill_per_sec: float, tokens: int = 1, timeout: float | None = None
+	) -> bool:
+		"""
+		取出 tokens 个令牌，不足时按脚本返回的等待时间休眠后重试；超过 timeout 仍未取到返回 False
+		capacity 为允许的突发请求数，refill_per_sec 为每秒补充的令牌数；任一为 0 时不限流
+		"""
+		if not capacity or not refill_per_sec:
+			return True
+		cache = frappe.cache()
+		key = cache.make_key(self.name)
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			args = [capacity, refill_per_sec, int(time.time() * 1000), tokens]
+			try:
+				wait_ms = _get_script()(keys=[key], args=args, client=cache)
+			except Exception:
+				# 缓存不可用时，不阻塞主流程
+				logger.warning("令牌桶 %s 不可用，跳过限流", self.name, exc_info=True)
+				return True
+			if not wait_ms:
+				return True
+			wait = int(wait_ms) / 1000
+			if deadline is not None:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					return False
+				wait = min(wait, remaining)
+			time.sleep(wait)
+
+
+# 调用远端 chain（scene_to_tech / tech_to_claims 等）的限流，容量与速率在 API Endpoint 中配置
+CHAIN_BUCKET = TokenBucket("patent_hub:chain_bucket")
@@ -0,0 +1,126 @@
+import functools
+import hashlib
+import hmac
+import re
+import threading
+from collections import namedtuple
+from datetime import UTC, datetime
+from urllib.parse import quote, urlencode
+
+import boto3
+import frappe
+from botocore.config import Config
+from frappe.utils.caching import site_cache
+
+# S3 客户端按 (access key, secret, region) 缓存：避免每次调用都重新加载 botocore 服务模型
+_S3_CLIENT_CACHE: dict[tuple, object] = {}
+_S3_CLIENT_LOCK = threading.Lock()
+_S3_SESSION = boto3.session.Session()
+_S3_CONFIG = Config(max_pool_connections=50, retries={"max_attempts": 5, "mode": "adaptive"})
+
+# API KEY 中 S3 相关的配置（密钥已解密）
+S3Config = namedtuple(
+	"S3Config",
+	["aws_access_key_id", "aws_secret_access_key", "aws_region", "s3_bucket_name"],
+)
+
+
+@site_cache(ttl=300, maxsize=1)
+def get_s3_config() -> S3Config:
+	"""读取 API KEY 中的 S3 配置并缓存 5 分钟，避免每次请求都查库 + 解密密钥"""
+	api_key = frappe.get_single("API KEY")
+	config = S3Config(
+		aws_access_key_id=api_key.get_password("aws_access_key_id", raise_exception=False),
+		aws_secret_access_key=api_key.get_password("aws_secret_access_key", raise_exception=False),
+		aws_region=api_key.aws_region,
+		s3_bucket_name=api_key.s3_bucket_name,
+	)
+	# 缺少任一字段时在此报错，不把空配置缓存下来
+	if not all(config):
+		frappe.throw("未配置 API KEY")
+	return config
+
+
+def clear_s3_config(doc=None, method=None):
+	"""doc_events：API KEY 保存后清除缓存"""
+	get_s3_config.clear_cache()
+
+
+def get_s3_client(aws_access_key_id: str, aws_secret_access_key: str, aws_region: str):
+	"""返回进程内复用的 S3 客户端（boto3 客户端本身是线程安全的）"""
+	key = (aws_access_key_id, aws_secret_access_key, aws_region)
+	client = _S3_CLIENT_CACHE.get(key)
+	if client is None:
+		# Session 创建客户端不是线程安全的，加锁
+		with _S3_CLIENT_LOCK:
+			client = _S3_CLIENT_CACHE.get(key)
+			if client is None:
+				client = _S3_SESSION.client(
+					"s3",
+					aws_access_key_id=aws_access_key_id,
+					aws_secret_access_key=aws_secret_access_key,
+					region_name=aws_region,
+					config=_S3_CONFIG,
+				)
+				_S3_CLIENT_CACHE[key] = client
+	return client
+
+
+# ---------------------------------------------------
+# 🔹 本地生成 SigV4 预签名 GET URL（不经过 botocore 事件系统）
+# ---------------------------------------------------
+
+# bucket 可以作为虚拟主机名（不含点号的 DNS 兼容名称）
+_VHOST_BUCKET_RE = re.compile(r"^[a-z0-9][a-z0-9\-]{1,61}[a-z0-9]$")
+
+
+@functools.lru_cache(maxsize=16)
+def _signing_key(aws_secret_access_key: str, datestamp: str, aws_region: str) -> bytes:
+	"""SigV4 签名密钥：同一天同一 region 内不变"""
+	key = f"AWS4{aws_secret_access_key}".encode()
+	for msg in (datestamp, aws_region, "s3", "aws4_request"):
+		key = hmac.new(key, msg.encode(), hashlib.sha256).digest()
+	return key
+
+
+def presign_get(
+	aws_access_key_id: str,
+	aws_secret_access_key: str,
+	aws_region: str,
+	bucket: str,
+	key: str,
+	expires_in: int = 3600,
+	now: datetime | None = None,
+) -> str:
+	"""生成 S3 GetObject 的 SigV4 预签名 URL，与 s3v4 签名的 client.generate_presigned_url 结果一致"""
+	now = now or datetime.now(UTC)
+	amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+	datestamp = amz_date[:8]
+	if _VHOST_BUCKET_RE.match(bucket):
+		host = f"{bucket}.s3.amazonaws.com"
+		path = f"/{quote(key, safe='/~')}"
+	else:
+		host = "s3.amazonaws.com" if aws_region == "us-east-1" else f"s3.{aws_region}.amazonaws.com"
+		path = f"/{bucket}/{quote(key, safe='/~')}"
+	scope = f"{datestamp}/{aws_region}/s3/aws4_request"
+	query = urlencode(
+		sorted(
+			{
+				"X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+				"X-Amz-Credential": f"{aws_access_key_id}/{scope}",
+				"X-Amz-Date": amz_date,
+				"X-Amz-Expires": str(expires_in),
+				"X-Amz-SignedHeaders": "host",
+			}.items()
+		),
+		quote_via=quote,
+		safe="~",
+	)
+	canonical_request = f"GET\n{path}\n{query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+	string_to_sign = (
+		f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+	)
+	signature = hmac.new(
+		_signing_key(aws_secret_access_key, datestamp, aws_region), string_to_sign.encode(), hashlib.sha256
+	).hexdigest()
+	return f"https://{host}{path}?{query}&X-Amz-Signature={signature}"
@@ -0,0 +1,11 @@
+import frappe
+from frappe import _
+
+
+def require(doc, fields: tuple[str, ...]):
+	"""校验必填字段：一次收集所有缺失字段，合并成一条错误抛出"""
+	missing = [_(doc.meta.get_label(f)) for f in fields if not doc.get(f)]
+	if len(missing) == 1:
+		frappe.throw(_("{0} is required to generate {1}").format(missing[0], _(doc.doctype)))
+	if missing:
+		frappe.throw(_("Missing required fields for {0}: {1}").format(_(doc.doctype), ", ".join(missing)))
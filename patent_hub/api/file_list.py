@@ -1,12 +1,17 @@
 import logging
 
-import boto3
 import frappe
+import orjson
 from frappe.utils import add_to_date, now_datetime
 
+from patent_hub.api._s3 import get_s3_config, presign_get
+
 logger = frappe.logger("app_patent_hub")
 logger.setLevel(logging.INFO)
 
+# 预签名 URL 在 Redis 中的缓存时间（略短于 URL 的 1 小时有效期）
+SIGNED_URL_CACHE_TTL = 3500
+
 
 def extract_s3_key_from_full_path(s3_full_path: str, bucket_name: str) -> str:
 	"""
@@ -23,34 +28,60 @@ def extract_s3_key_from_full_path(s3_full_path: str, bucket_name: str) -> str:
 		return ""
 
 
+def _signed_url_cache_key(cache, bucket_name: str, s3_object_key: str):
+	return cache.make_key(f"s3sig:{bucket_name}:{s3_object_key}")
+
+
+def get_cached_signed_urls(bucket_name: str, s3_object_keys: list[str]) -> list:
+	"""
+	一次 MGET 取出各 key 在 Redis 中缓存的 (signed_url, generated_at)，未命中为 None
+	跨 web / worker 进程复用同一个 URL；Redis 不可用时全部按未命中处理
+	"""
+	if not s3_object_keys:
+		return []
+	cache = frappe.cache()
+	try:
+		values = cache.mget([_signed_url_cache_key(cache, bucket_name, k) for k in s3_object_keys])
+	except Exception as e:
+		logger.warning(f"读取签名URL缓存失败: {e}")
+		return [None] * len(s3_object_keys)
+	return [orjson.loads(v) if v else None for v in values]
+
+
+def cache_signed_urls(bucket_name: str, entries: list[tuple[str, str, str]]):
+	"""把 (s3_object_key, signed_url, generated_at) 写入 Redis，单次 pipeline 提交"""
+	if not entries:
+		return
+	cache = frappe.cache()
+	try:
+		pipe = cache.pipeline()
+		for s3_object_key, signed_url, generated_at in entries:
+			pipe.set(
+				_signed_url_cache_key(cache, bucket_name, s3_object_key),
+				orjson.dumps((signed_url, generated_at)),
+				ex=SIGNED_URL_CACHE_TTL,
+			)
+		pipe.execute()
+	except Exception as e:
+		logger.warning(f"写入签名URL缓存失败: {e}")
+
+
 @frappe.whitelist()
 def generate_signed_urls(doclabel: str, docname: str):
 	"""为上传的文件生成签名URL"""
 	try:
-		doc = frappe.get_doc(doclabel, docname)
+		try:
+			doc = frappe.get_doc(doclabel, docname)
+		except frappe.DoesNotExistError:
+			return {"success": False, "error": f"文档 {docname} 不存在"}
 		# 检查是否有任何 s3_url 存在
 		has_s3_urls = any(file.s3_url for file in doc.generated_files)
 		if not has_s3_urls:
 			return {"success": True, "message": "没有 S3 文件需要生成签名URL"}
-		# 获取 AWS 配置
-		api_key = frappe.get_single("API KEY")
-		if not api_key:
-			frappe.throw("未配置 API KEY")
-		aws_access_key_id = api_key.get_password("aws_access_key_id")
-		aws_secret_access_key = api_key.get_password("aws_secret_access_key")
-		aws_region = api_key.aws_region
-		s3_bucket_name = api_key.s3_bucket_name
-		# 检查配置完整性
-		if not all([aws_access_key_id, aws_secret_access_key, aws_region, s3_bucket_name]):
-			frappe.throw("AWS S3 configuration is incomplete. Please check API KEY settings.")
-		# 初始化 S3 客户端
-		client = boto3.client(
-			"s3",
-			aws_access_key_id=aws_access_key_id,
-			aws_secret_access_key=aws_secret_access_key,
-			region_name=aws_region,
-		)
-		updated = False
+		# 获取 AWS 配置（不完整时 get_s3_config 直接报错）
+		aws_access_key_id, aws_secret_access_key, aws_region, s3_bucket_name = get_s3_config()
+		# 先筛出需要（重新）生成签名URL的记录
+		pending = []
 		for file in doc.generated_files:
 			# 跳过没有 s3_url 的记录
 			if not file.s3_url:
@@ -66,28 +97,45 @@ def generate_signed_urls(doclabel: str, docname: str):
 				logger.warning(_warning)
 				frappe.msgprint(_warning, alert=True)
 				continue
-			try:
-				# 生成预签名URL
-				url = client.generate_presigned_url(
-					"get_object",
-					Params={"Bucket": s3_bucket_name, "Key": s3_object_key},
-					ExpiresIn=3600,  # 1小时过期
-				)
-				file.signed_url = url
-				file.signed_url_generated_at = now_datetime()
-				# file_name
-				_s3_url = file.s3_url
-				fn = _s3_url.split("/")
-				file.file_name = fn[-1]
-				logger.info(f"file_name: {file.file_name}")
-				updated = True
+			pending.append((file, s3_object_key))
+
+		# 其他进程已生成且未过期的签名URL直接复用
+		cached = get_cached_signed_urls(s3_bucket_name, [k for _, k in pending])
+		# 本地 SigV4 签名只是几次 HMAC，串行即可，无需线程池
+		updates = {}
+		to_cache = []
+		for (file, s3_object_key), hit in zip(pending, cached, strict=True):
+			if hit:
+				signed_url, generated_at = hit
+			else:
+				try:
+					# 生成预签名URL（1小时过期）
+					signed_url = presign_get(
+						aws_access_key_id,
+						aws_secret_access_key,
+						aws_region,
+						s3_bucket_name,
+						s3_object_key,
+						3600,
+					)
+				except Exception as e:
+					logger.error(f"Error generating presigned URL for key '{s3_object_key}': {e}")
+					updates[file.name] = {"signed_url": f"Error: {e!s}"}
+					continue
+				# 记录实际签名时间，复用缓存时据此判断过期
+				generated_at = str(now_datetime())
+				to_cache.append((s3_object_key, signed_url, generated_at))
 				logger.info(f"Generated signed URL for: {s3_object_key}")
-			except Exception as e:
-				logger.error(f"Error generating presigned URL for key '{s3_object_key}': {e}")
-				file.signed_url = f"Error: {e!s}"
-				updated = True
-		if updated:
-			doc.save(ignore_permissions=True)
+			updates[file.name] = {
+				"signed_url": signed_url,
+				"signed_url_generated_at": generated_at,
+				# file_name
+				"file_name": file.s3_url.split("/")[-1],
+			}
+		cache_signed_urls(s3_bucket_name, to_cache)
+		if updates:
+			# 只更新变化的子表行与字段，不走 doc.save() 对整张子表的重写
+			frappe.db.bulk_update("File List", updates, update_modified=False)
 			frappe.db.commit()
 		return {"success": True}
 	except Exception as e:
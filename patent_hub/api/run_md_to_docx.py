@@ -1,118 +1,58 @@
-import asyncio
 import base64
-import json
-import logging
-import os
-import re
-import textwrap
+import hashlib
 
-import boto3
 import frappe
-import httpx
-from frappe import enqueue
-from frappe.utils import add_to_date, now_datetime
 
-logger = frappe.logger("app_patent_hub")
-logger.setLevel(logging.INFO)
+from patent_hub.api._batch_runner import drain_and_dispatch, enqueue_drain
+from patent_hub.api._pipeline_runner import make_tmp_folder, markdown_title, start
 
-TIMEOUT = 1800
+DOCTYPE = "MD To Docx"
+# 远端请求超时；任务超时比它多留出回写状态的余量
+HTTP_TIMEOUT = 1500
+JOB_TIMEOUT = 1800
 
 
 @frappe.whitelist()
 def run(docname):
-	try:
-		logger.info(f"开始处理文档：{docname}")
-		doc = frappe.get_doc("MD To Docx", docname)
-		if not doc:
-			return {"success": False, "error": f"文档 {docname} 不存在"}
-		if doc.is_done:
-			return {"success": False, "error": "任务已完成，不可重复运行"}
-		if doc.is_running:
-			return {"success": False, "error": "任务正在运行中，请等待完成"}
-		doc.is_running = 1
-		doc.save()
-		frappe.db.commit()
-		enqueue(
-			"patent_hub.api.run_md_to_docx._job",
-			queue="long",
-			timeout=TIMEOUT,
-			docname=docname,
-			user=frappe.session.user,
-		)
-		return {"success": True, "message": "任务已成功提交"}
-	except Exception as e:
-		logger.error(f"启动任务失败: {e}")
-		logger.error(frappe.get_traceback())
-		return {"success": False, "error": f"启动任务失败: {e}"}
-
-
-def _job(docname, user=None):
-	logger.info(f"进入 job: {docname}")
-	try:
-		doc = frappe.get_doc("MD To Docx", docname)
-		if not doc:
-			frappe.throw(f"文档 {docname} 不存在")
-		# 确保任务开始时设置正确的状态
-		doc.is_running = 1
-		doc.is_done = 0
-		doc.save()
-		frappe.db.commit()
-		# 请求 URL
-		api_endpoint = frappe.get_single("API Endpoint")
-		if not api_endpoint:
-			frappe.throw("未配置 API Endpoint")
-		base_url = api_endpoint.server_ip_port.rstrip("/")
-		app_name = api_endpoint.md_to_docx.strip("/")
-		url = f"{base_url}/{app_name}/invoke"
-		logger.info(f"请求 URL：{url}")
-		# 编码 markdown
-		markdown_text = doc.markdown or ""
-		md_base64 = base64.b64encode(markdown_text.encode("utf-8")).decode("utf-8")
-		# 提取标题作为文件夹名
-		_match = re.search(r"^#\s*(.+)", markdown_text, re.MULTILINE)
-		_title = _match.group(1).strip() if _match else "tmp"
-		_title = re.sub(r"[^\w\u4e00-\u9fa5\-]", "", _title)  # 去除标点，保留连字符、中文、字母、数字
-		# 拼接 tmp_folder
-		server_work_dir = api_endpoint.get_password("server_work_dir")
-		tmp_folder = os.path.join(server_work_dir, _title, "m2d")
-		# payload
-		payload = {"input": {"md_base64": md_base64, "tmp_folder": tmp_folder}}
-
-		async def call_chain():
-			async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-				return await client.post(url, json=payload)
-
-		res = asyncio.run(call_chain())
-		res.raise_for_status()
-		res_json = res.json()
-		# output
-		output = json.loads(res_json["output"])
-		logger.info(f"解析后的 JSON: {output}")
-		doc.time_s = output.get("TIME(s)", 0.0)
-		doc.cost = output.get("cost", 0)
-		# s3_urls
-		s3_urls = output.get("generated_files", [])
-		doc.set("generated_files", [{"s3_url": u} for u in s3_urls])
-		doc.is_done = 1
-		doc.is_running = 0
-		doc.save()
-		frappe.db.commit()
-		frappe.publish_realtime("md_to_docx_done", {"docname": doc.name}, user=user)
-	except Exception as e:
-		logger.error(f"任务 {docname} 执行失败: {e!s}")
-		logger.error(frappe.get_traceback())
-		try:
-			# 更新文档状态为失败
-			doc = frappe.get_doc("MD To Docx", docname)
-			# error_msg
-			error_msg = f"失败: {e!s}"
-			short_error_msg = textwrap.shorten(error_msg, width=135, placeholder="...")
-			doc.set("generated_files", [{"s3_url": short_error_msg}])
-			# 重置运行状态
-			doc.is_done = 0
-			doc.is_running = 0
-			doc.save()
-			frappe.db.commit()
-			frappe.publish_realtime("md_to_docx_failed", {"error": str(e), "docname": docname}, user=user)
-		except Exception as save_error:
-			logger.error(f"保存失败状态时出错: {save_error!s}")
+	# 只置 is_running，由批量 drain 任务统一调用远端
+	result = start(
+		DOCTYPE,
+		docname,
+		None,
+		JOB_TIMEOUT,
+		required=("markdown", "Markdown 不能为空，请先填写后再运行任务"),
+		content_hasher=_content_hash,
+	)
+	if result["success"] and not result.get("unchanged"):
+		enqueue_drain(DOCTYPE, "patent_hub.api.run_md_to_docx.drain", JOB_TIMEOUT)
+	return result
+
+
+def _content_hash(doc):
+	return hashlib.blake2b((doc.markdown or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _build_payload(doc, server_work_dir):
+	# 编码 markdown
+	markdown_text = doc.markdown or ""
+	md_base64 = base64.b64encode(markdown_text.encode("utf-8")).decode("ascii")
+	# 提取标题作为文件夹名
+	tmp_folder = make_tmp_folder(server_work_dir, markdown_title(markdown_text), "m2d")
+	return {"input": {"md_base64": md_base64, "tmp_folder": tmp_folder}}
+
+
+def enqueue_pending():
+	"""cron：兜底调度 run() 之后未被 drain 取走的文档"""
+	enqueue_drain(DOCTYPE, "patent_hub.api.run_md_to_docx.drain", JOB_TIMEOUT)
+
+
+def drain():
+	drain_and_dispatch(
+		DOCTYPE,
+		"md_to_docx",
+		_build_payload,
+		"md_to_docx_done",
+		"md_to_docx_failed",
+		HTTP_TIMEOUT,
+		content_hasher=_content_hash,
+	)
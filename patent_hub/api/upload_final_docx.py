@@ -1,102 +1,120 @@
-import base64
 import logging
 import os
 import re
-import tempfile
-import unicodedata
-import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import boto3
 import frappe
-from frappe.utils import add_to_date, now_datetime
+from boto3.s3.transfer import TransferConfig
+
+from patent_hub.api._s3 import get_s3_client, get_s3_config
 
 logger = frappe.logger("app_patent_hub")
 logger.setLevel(logging.INFO)
 
+# 去除标点，保留连字符、中文、字母、数字
+_TITLE_SANITIZE_RE = re.compile(r"[^\w\u4e00-\u9fa5\-]")
+
+# 超过 8MB 自动分片并发上传
+TRANSFER_CONFIG = TransferConfig(
+	multipart_threshold=8 * 1024**2,
+	multipart_chunksize=8 * 1024**2,
+	max_concurrency=10,
+	use_threads=True,
+)
+
+# 需要上传的附件：(字段名, 名称, S3 文件扩展名, Content-Type)
+UPLOAD_SPECS = (
+	("final_markdown", "Final Markdown", ".txt", "text/plain"),
+	(
+		"final_docx",
+		"Final Docx",
+		".docx",
+		"application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+	),
+)
+
+
+def _site_file_path(file_url: str) -> str:
+	"""
+	由附件的 file_url 直接得到站点内的本地路径，无需逐个查询 File 文档
+	/private/files/x -> private/files/x，/files/x -> public/files/x
+	"""
+	file_name = file_url.split("/")[-1]
+	if file_url.startswith("/files/"):
+		return frappe.get_site_path("public", "files", file_name)
+	return frappe.get_site_path("private", "files", file_name)
+
+
+def _upload_one(s3_client, s3_bucket_name: str, file_path: str, s3_key: str, content_type: str) -> str:
+	"""
+	把单个本地文件上传到 S3，返回 s3:// URL
+	在线程池中运行：线程内没有 frappe.local 上下文，这里不能调用 frappe.*
+	"""
+	# 按分片流式读取，不整体读入内存
+	with open(file_path, "rb") as f:
+		s3_client.upload_fileobj(
+			f,
+			s3_bucket_name,
+			s3_key,
+			ExtraArgs={"ContentType": content_type},
+			Config=TRANSFER_CONFIG,
+		)
+	return f"s3://{s3_bucket_name}/{s3_key}"
+
 
 @frappe.whitelist()
 def upload_files(docname):
 	"""上传 Final Markdown 和 Final Docx 文件到 S3"""
 	try:
 		logger.info(f"开始上传文件：{docname}")
-		doc = frappe.get_doc("Upload Final Docx", docname)
-		if not doc:
+		try:
+			doc = frappe.get_doc("Upload Final Docx", docname)
+		except frappe.DoesNotExistError:
 			return {"success": False, "error": f"文档 {docname} 不存在"}
 		# 检查是否有文件需要上传
-		if not doc.final_markdown and not doc.final_docx:
+		if not any(doc.get(field) for field, *_ in UPLOAD_SPECS):
 			return {"success": False, "error": "没有文件需要上传"}
-		# 获取 AWS 配置
-		api_key = frappe.get_single("API KEY")
-		if not api_key:
-			return {"success": False, "error": "未配置 API KEY"}
-		aws_access_key_id = api_key.get_password("aws_access_key_id")
-		aws_secret_access_key = api_key.get_password("aws_secret_access_key")
-		aws_region = api_key.aws_region
-		s3_bucket_name = api_key.s3_bucket_name
-		if not all([aws_access_key_id, aws_secret_access_key, aws_region, s3_bucket_name]):
-			return {"success": False, "error": "AWS S3 配置不完整"}
-		# 初始化 S3 客户端
-		s3_client = boto3.client(
-			"s3",
-			aws_access_key_id=aws_access_key_id,
-			aws_secret_access_key=aws_secret_access_key,
-			region_name=aws_region,
-		)
+		# 获取 AWS 配置（不完整时 get_s3_config 直接报错）
+		aws_access_key_id, aws_secret_access_key, aws_region, s3_bucket_name = get_s3_config()
+		# S3 客户端（进程内复用）
+		s3_client = get_s3_client(aws_access_key_id, aws_secret_access_key, aws_region)
 		# 生成 S3 路径前缀
 		patent_title = doc.patent_title or "untitled"
-		_title = re.sub(r"[^\w\u4e00-\u9fa5\-]", "", patent_title)  # 去除标点，保留连字符、中文、字母、数字
+		_title = _TITLE_SANITIZE_RE.sub("", patent_title)
 		timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 		s3_prefix = f"{_title}/ufd"
-		uploaded_files = []
-		# 上传 Final Markdown
-		if doc.final_markdown:
-			try:
-				file_name = doc.final_markdown.split("/")[-1]
-				file_path = frappe.get_site_path("private", "files", file_name)
-				if not os.path.exists(file_path):
-					raise FileNotFoundError(f"文件未找到: {file_path}")
-				logger.info(f"找到文件路径: {file_path}")
-				# 读取文件内容
-				with open(file_path, "rb") as f:
-					file_content = f.read()
-				# 确定文件扩展名
-				s3_key = f"{s3_prefix}/{timestamp}.txt"
-				# 上传到 S3
-				s3_client.put_object(
-					Bucket=s3_bucket_name, Key=s3_key, Body=file_content, ContentType="text/plain"
+		# 本地路径在请求线程中解析并检查，线程池只拿到普通的路径字符串
+		jobs = []
+		for field, label, ext, content_type in UPLOAD_SPECS:
+			file_url = doc.get(field)
+			if not file_url:
+				continue
+			file_path = _site_file_path(file_url)
+			if not os.path.exists(file_path):
+				logger.error(f"上传 {label} 失败: 文件未找到: {file_path}")
+				return {"success": False, "error": f"上传 {label} 失败: 文件未找到: {file_path}"}
+			logger.info(f"找到文件路径: {file_path}")
+			jobs.append((label, file_path, f"{s3_prefix}/{timestamp}{ext}", content_type))
+		# markdown 与 docx 并发上传，共用同一个 S3 客户端的连接池
+		with ThreadPoolExecutor(max_workers=2) as executor:
+			futures = [
+				(
+					label,
+					executor.submit(_upload_one, s3_client, s3_bucket_name, file_path, s3_key, content_type),
 				)
-				s3_url = f"s3://{s3_bucket_name}/{s3_key}"
-				uploaded_files.append(s3_url)
-				logger.info(f"Final Markdown 上传成功: {s3_url}")
-			except Exception as e:
-				logger.error(f"上传 Final Markdown 失败: {e}")
-				return {"success": False, "error": f"上传 Final Markdown 失败: {e}"}
-		# 上传 Final Docx
-		if doc.final_docx:
+				for label, file_path, s3_key, content_type in jobs
+			]
+		# 两个都完成后再按顺序汇总
+		uploaded_files = []
+		for label, future in futures:
 			try:
-				file_name = doc.final_docx.split("/")[-1]
-				file_path = frappe.get_site_path("private", "files", file_name)
-				if not os.path.exists(file_path):
-					raise FileNotFoundError(f"文件未找到: {file_path}")
-				logger.info(f"找到文件路径: {file_path}")
-				# 读取文件内容
-				with open(file_path, "rb") as f:
-					file_content = f.read()
-				s3_key = f"{s3_prefix}/{timestamp}.docx"
-				# 上传到 S3
-				s3_client.put_object(
-					Bucket=s3_bucket_name,
-					Key=s3_key,
-					Body=file_content,
-					ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-				)
-				s3_url = f"s3://{s3_bucket_name}/{s3_key}"
-				uploaded_files.append(s3_url)
-				logger.info(f"Final Docx 上传成功: {s3_url}")
+				s3_url = future.result()
 			except Exception as e:
-				logger.error(f"上传 Final Docx 失败: {e}")
-				return {"success": False, "error": f"上传 Final Docx 失败: {e}"}
+				logger.error(f"上传 {label} 失败: {e}")
+				return {"success": False, "error": f"上传 {label} 失败: {e}"}
+			uploaded_files.append(s3_url)
+			logger.info(f"{label} 上传成功: {s3_url}")
 		# 更新文档的 generated_files 表
 		if uploaded_files:
 			# 清空现有的 generated_files（如果需要保留，可以注释这行）
@@ -1,13 +1,15 @@
-import random
+import secrets
 import string
 
 import frappe
 from frappe.utils.password import update_password
 
+# 随机密码字符集（字母 + 数字）
+_PW_CHARS = string.ascii_letters + string.digits
+
 
 def generate_random_password(length=10):
-	chars = string.ascii_letters + string.digits
-	return "".join(random.choice(chars) for _ in range(length))
+	return "".join(secrets.choice(_PW_CHARS) for _ in range(length))
 
 
 def create_patent_writer_user(email, full_name):
@@ -11,10 +11,23 @@ scheduler_events = {
 		"*/5 * * * *": [  # 每 5 分钟检查一次
 			"patent_hub.api._ali_spot.check_spot_status",
 			"patent_hub.api._utils.detect_and_reset_all_stuck_tasks_multi",
-		]
+		],
+		"* * * * *": [  # 每分钟兜底调度排队中的 MD To Docx
+			"patent_hub.api.run_md_to_docx.enqueue_pending",
+		],
 	}
 }
 
+doc_events = {
+	# 配置变更后清除进程内缓存
+	"API Endpoint": {
+		"on_update": "patent_hub.api._pipeline_runner.clear_api_endpoint_config",
+	},
+	"API KEY": {
+		"on_update": "patent_hub.api._s3.clear_s3_config",
+	},
+}
+
 
 fixtures = [
 	# 权限与用户配置
@@ -4,10 +4,11 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.model.naming import make_autoname
+
+from patent_hub.api._naming import next_name
 
 
 class Code2png(Document):
 	def autoname(self):
 		# 自动生成主键和 code2png_id：C2P-YYYYMMDD-##
-		self.name = make_autoname("C2P-.YYYY.MM.DD.-.##")
+		self.name = next_name("C2P-.YYYY.MM.DD.-.##")
@@ -6,7 +6,12 @@ import re
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.model.naming import make_autoname
+
+from patent_hub.api._naming import next_name
+
+# 去除标点（保留空白与连字符）
+_NAME_CLEAN_RE = re.compile(r"[^\w\s-]")
+_NAME_SPACE_RE = re.compile(r"\s")
 
 
 class LLMChatSession(Document):
@@ -16,9 +21,9 @@ class LLMChatSession(Document):
 		# 获取当前用户 Full Name
 		user_id = frappe.session.user
 		full_name = frappe.db.get_value("User", user_id, "full_name") or user_id
-		clean_name = re.sub(r"[^\w\s-]", "", full_name)
-		safe_name = re.sub(r"\s", "_", clean_name).replace("-", "_")
-		self.chat_id = make_autoname(f"CHAT-{safe_name}-{self.llm_provider}-.YYYY.MM.DD.-.##")
+		clean_name = _NAME_CLEAN_RE.sub("", full_name)
+		safe_name = _NAME_SPACE_RE.sub("_", clean_name).replace("-", "_")
+		self.chat_id = next_name(f"CHAT-{safe_name}-{self.llm_provider}-.YYYY.MM.DD.-.##")
 		self.name = self.chat_id
 		self.sys_prompt = """你是一位专业的知识产权顾问和发明专利策划专家，专门帮助用户进行发明专利选题讨论和规划。你的主要任务是：
 
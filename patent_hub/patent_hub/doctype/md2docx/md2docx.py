@@ -4,10 +4,11 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.model.naming import make_autoname
+
+from patent_hub.api._naming import next_name
 
 
 class Md2docx(Document):
 	def autoname(self):
 		# 自动生成主键和 md2docx_id：M2D-YYYYMMDD-##
-		self.name = make_autoname("M2D-.YYYY.MM.DD.-.##")
+		self.name = next_name("M2D-.YYYY.MM.DD.-.##")
@@ -14,10 +14,7 @@ frappe.ui.form.on('MD To Docx', {
           await frm.reload_doc();  // 保证最新状态
         }
         // 🟢 状态判断
-        if (frm.doc.is_done) {
-          frappe.show_alert({ message: '任务已完成，不可重复运行。', indicator: 'orange' }, 5);
-          return;
-        }
+        // 已完成的文档由服务端按 markdown 是否变化决定沿用结果或重新运行
         if (frm.doc.is_running) {
           frappe.show_alert({ message: '任务正在运行中，请稍候完成。', indicator: 'yellow' }, 5);
           return;
@@ -29,7 +26,9 @@ frappe.ui.form.on('MD To Docx', {
           freeze: true,
           freeze_message: '任务提交中，请稍候...'
         });
-        if (res.message?.success) {
+        if (res.message?.unchanged) {
+          frappe.show_alert({ message: 'Markdown 未变化，沿用上次生成的文档。', indicator: 'green' }, 6);
+        } else if (res.message?.success) {
           frappe.show_alert({ message: '✅ 任务已提交，稍后会自动刷新结果。', indicator: 'blue' }, 6);
         } else {
           throw new Error(res.message?.error || '未知错误');
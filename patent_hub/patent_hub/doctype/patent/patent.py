@@ -1,24 +1,28 @@
 # Copyright (c) 2025, sz and contributors
 # For license information, please see license.txt
 
-import re
-
 import frappe
 from frappe import _
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 
+from patent_hub.api._naming import safe_name as _safe_name
+
+
+def _get_s3_bucket() -> str:
+	"""S3 桶名为普通 Data 字段，直接读缓存的 API KEY 文档（保存时由 frappe 自动失效）"""
+	return frappe.get_cached_doc("API KEY").s3_bucket_name
+
 
 class Patent(Document):
 	def before_insert(self):
 		if not self.patent_name:
 			frappe.throw(_("Patent Name is required to generate Patent ID"))
-		clean_name = re.sub(r"[^\w\s-]", "", self.patent_name)
-		safe_name = re.sub(r"\s", "_", clean_name).replace("-", "_")
+		# patent_id 后续按 - 拆分，名称中的连字符也替换为 _
+		safe_name = _safe_name(self.patent_name)
 		self.patent_id = make_autoname(f"PAT-{safe_name}-.##")
 		try:
-			api_key = frappe.get_single("API KEY")
-			S3_BUCKET_NAME = api_key.get_password("s3_bucket_name")
+			S3_BUCKET_NAME = _get_s3_bucket()
 			if not S3_BUCKET_NAME:
 				frappe.throw(_("S3 Bucket Name is not configured in Cloud Storage Settings."))
 		except frappe.DoesNotExistError:
@@ -1,13 +1,13 @@
 # Copyright (c) 2025, sz and contributors
 # For license information, please see license.txt
 
-import re
-
 import frappe
 from frappe import _
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 
+from patent_hub.api._naming import safe_name as _safe_name
+
 
 class PatentAgency(Document):
 	def before_insert(self):
@@ -15,6 +15,6 @@ class PatentAgency(Document):
 			frappe.throw(_("Agent Name is required to generate Patent Agency"))
 		# if not self.weixin:
 		# 	frappe.throw(_("Weixin is required to generate Patent Agency"))
-		safe_name = re.sub(r"[^\w\s-]", "", self.agent_name).replace(" ", "_")
+		safe_name = _safe_name(self.agent_name, keep_dash=True)
 		self.agency_id = make_autoname(f"AGY-{safe_name}-.##")
 		self.name = self.agency_id
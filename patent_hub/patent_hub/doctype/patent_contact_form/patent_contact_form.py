@@ -1,52 +1,91 @@
-import re
+import functools
+import hashlib
+import logging
+import time
 
 import frappe
-import requests
+import httpx
 from frappe import _
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 from frappe.utils import escape_html, get_url, validate_email_address
 
+from patent_hub.api._http import HTTP
+from patent_hub.api._naming import safe_name as _safe_name
+
+logger = frappe.logger("app_patent_hub")
+logger.setLevel(logging.INFO)
+
+# 留言长度上限（strip 之后）；strip 之前的原始长度按两倍放宽
+_MAX_MESSAGE_LEN = 8000
+_MAX_RAW = 16000
+# 姓名 / 邮箱长度上限
+_MAX_FIELD_LEN = 256
+
 VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
+# 连接 3 秒、读取 5 秒
+TURNSTILE_TIMEOUT = httpx.Timeout(5, connect=3)
+# 校验成功的 token 在此时间内可重复使用（秒）
+TURNSTILE_REUSE_TTL = 300
 
 # 允许的主机名（Turnstile 返回的 hostname）——含本地联调域名
-ALLOWED_HOSTNAMES = {
-	"aifreesyou.com",
-	"www.aifreesyou.com",
-	"aifreesyou.s.frappe.cloud",
-}
-
-
-def _get_client_ip() -> str:
-	"""尽可能准确获取客户端 IP（兼容代理/Cloudflare）"""
-	headers = frappe.request.headers if getattr(frappe, "request", None) else {}
-	ip = (
-		headers.get("CF-Connecting-IP")
-		or headers.get("X-Forwarded-For", "").split(",")[0].strip()
-		or getattr(frappe.local, "request_ip", None)
-		or "unknown"
-	)
+ALLOWED_HOSTNAMES = frozenset(
+	{
+		"aifreesyou.com",
+		"www.aifreesyou.com",
+		"aifreesyou.s.frappe.cloud",
+	}
+)
+
+
+def _get_client_ip(req=None) -> str:
+	"""
+	尽可能准确获取客户端 IP（兼容代理/Cloudflare），同一请求内只解析一次
+	req：调用方已取得的请求对象，不传时取当前请求
+	"""
+	ip = getattr(frappe.local, "patent_hub_client_ip", None)
+	if ip:
+		return ip
+	req = req or getattr(frappe, "request", None)
+	headers = req.headers if req else {}
+	ip = headers.get("CF-Connecting-IP")
+	if not ip:
+		# X-Forwarded-For 取第一个地址，partition 不生成列表
+		ip = headers.get("X-Forwarded-For", "").partition(",")[0].strip()
+	ip = ip or getattr(frappe.local, "request_ip", None) or "unknown"
+	frappe.local.patent_hub_client_ip = ip
 	return ip
 
 
 def _get_turnstile_secret() -> str:
 	"""从 Single DocType 读取 Turnstile Secret（保密字段）"""
-	api_key = frappe.get_single("API KEY")
-	secret = api_key.get_password("turnstile_secret_key")
+	secret = frappe.get_cached_doc("API KEY").get_password("turnstile_secret_key")
 	if not secret:
 		frappe.throw(_("Turnstile secret key not configured in 'API KEY'."))
 	return secret
 
 
-def _verify_turnstile(token: str):
-	host = frappe.request.host if getattr(frappe, "request", None) else ""
+def _verify_turnstile(token: str, req=None):
+	req = req or getattr(frappe, "request", None)
+	host = req.host if req else ""
 	# 本地放行（或用配置开关）
 	if host == "localhost" or host.endswith(".localhost"):
 		return
+	# 同一 token 重复提交（双击/重试）时复用最近一次的成功结果；
+	# site_config 设置 turnstile_strict 后每次都向 Cloudflare 校验
+	strict = frappe.conf.get("turnstile_strict")
+	cache_key = f"turnstile:ok:{hashlib.sha256(token.encode()).hexdigest()}"
+	if not strict and frappe.cache().get_value(cache_key):
+		return
 	# 正式校验
 	secret = _get_turnstile_secret()
-	ip = _get_client_ip()
-	r = requests.post(VERIFY_URL, data={"secret": secret, "response": token, "remoteip": ip}, timeout=8)
+	ip = _get_client_ip(req)
+	# 复用进程级连接池，keep-alive 省去每次到 Cloudflare 的 TCP + TLS 握手
+	r = HTTP.post(
+		VERIFY_URL,
+		data={"secret": secret, "response": token, "remoteip": ip},
+		timeout=TURNSTILE_TIMEOUT,
+	)
 	r.raise_for_status()
 	data = r.json()
 	ok = bool(data.get("success"))
@@ -56,48 +95,83 @@ def _verify_turnstile(token: str):
 		# 可在开发阶段临时打印 error-codes；上线后建议只记简短日志
 		# frappe.log_error(title="Turnstile Debug", message=frappe.as_json(data))
 		frappe.throw(_("Captcha verification failed. Please try again."))
+	if not strict:
+		frappe.cache().set_value(cache_key, 1, expires_in_sec=TURNSTILE_REUSE_TTL)
+
+
+# 滑动窗口限流：每个键一个有序集合，记录窗口内每次请求的时间戳（毫秒）
+# KEYS=[计数键...]；ARGV=[now_ms, window_ms, limit, member]
+# 先检查所有键，全部未超限才一起记入；放行返回 0，否则返回第一个超限键的序号（从 1 开始）
+_RATE_LIMIT_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+for i = 1, #KEYS do
+	redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, now - window)
+	if redis.call('ZCARD', KEYS[i]) >= limit then return i end
+end
+for i = 1, #KEYS do
+	redis.call('ZADD', KEYS[i], now, ARGV[4])
+	redis.call('PEXPIRE', KEYS[i], window)
+end
+return 0
+"""
+
 
+@functools.cache
+def _get_script(lua: str):
+	"""注册 Lua 脚本（调用时走 EVALSHA，脚本缓存丢失时自动重新加载）"""
+	return frappe.cache().register_script(lua)
 
-def _rate_limit(key: str, limit: int, ttl: int):
-	"""简单限流：在 ttl 秒内最多 limit 次；用 incr + expire 更原子"""
+
+def _rate_limit(keys: list[str], limit: int, ttl: int):
+	"""滑动窗口限流：每个键任意连续 ttl 秒内最多 limit 次；所有键一次往返原子检查"""
 	cache = frappe.cache()
+	# member 需唯一：同一毫秒内的多次请求也要分别计数
+	args = [int(time.time() * 1000), ttl * 1000, limit, frappe.generate_hash(length=12)]
 	try:
-		count = cache.incr(key)
-		if count == 1:
-			cache.expire(key, ttl)
-		if count > limit:
-			frappe.throw(_("Too many requests, please try later."))
+		exceeded = _get_script(_RATE_LIMIT_LUA)(keys=keys, args=args, client=cache)
 	except Exception:
 		# 缓存不可用时，不阻塞主流程
-		pass
+		return
+	if exceeded:
+		logger.info("Contact form rate limit hit: %s", keys[int(exceeded) - 1])
+		frappe.throw(_("Too many requests, please try later."))
 
 
 class PatentContactForm(Document):
 	def before_insert(self):
+		# 请求对象只取一次，传给各校验 helper（非请求上下文时为 None）
+		req = getattr(frappe, "request", None)
 		# ---- 基础清洗/校验 ----
+		# 先按原始长度拒绝超长输入，避免对超大内容做 strip / 正则处理
+		if len(self.message or "") > _MAX_RAW:
+			frappe.throw(_("Message is too long."))
+		if len(self.full_name or "") > _MAX_FIELD_LEN or len(self.email or "") > _MAX_FIELD_LEN:
+			frappe.throw(_("Full Name or Email is too long."))
 		self.full_name = (self.full_name or "").strip()
 		self.email = (self.email or "").strip()
 		self.message = (self.message or "").strip()
 		if not self.full_name or not self.email or not self.message:
 			frappe.throw(_("Full Name, Email and Message are required."))
-		safe_name = re.sub(r"[^\w\s-]", "", self.full_name).replace(" ", "_")
+		safe_name = _safe_name(self.full_name, keep_dash=True)
 		self.contact_id = make_autoname(f"CT-{safe_name}-.###")
 		self.name = self.contact_id
 		# email_err = validate_email_address(self.email, throw=False)
 		# if email_err:
 		# 	frappe.throw(_("Invalid email address."))
-		if len(self.message) > 8000:
+		if len(self.message) > _MAX_MESSAGE_LEN:
 			frappe.throw(_("Message is too long."))
 		# # ---- Turnstile 校验 ----
 		# token = (self.get("turnstile_token") or "").strip()
 		# if not token:
 		# 	frappe.throw(_("Captcha token missing."))
-		# _verify_turnstile(token)
+		# _verify_turnstile(token, req)
 		self.turnstile_token = ""  # 通过后清空
 		# ---- 限流（按 IP + 邮箱）----
-		ip = _get_client_ip()
-		_rate_limit(f"patent-contact:ip:{ip}", limit=5, ttl=300)  # 5 分钟最多 5 次
-		_rate_limit(f"patent-contact:email:{self.email}", limit=5, ttl=300)
+		ip = _get_client_ip(req)
+		# 5 分钟内同一 IP、同一邮箱各最多 5 次
+		_rate_limit([f"patent-contact:ip:{ip}", f"patent-contact:email:{self.email}"], limit=5, ttl=300)
 
 	# def after_insert(self):
 	# 	"""可选：落库后发通知邮件"""
@@ -6,6 +6,21 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 
+# 按流程顺序排列的（状态字段, 阶段名称）
+_STAGES = (
+	# Title2Scene 流程链
+	("status_title2scene", "专利题目→应用分析（Title2Scene）"),
+	("status_scene2tech", "应用分析→技术交底（Scene2Tech）"),
+	# Info2Tech 流程链（可能与 Title2Scene 并行）
+	("status_info2tech", "补充材料→技术交底（Info2Tech）"),
+	# 两条流程交汇于 Tech2Application
+	("status_tech2application", "技术交底→申请txt（Tech2Application）"),
+	("status_align2tex2docx", "申请txt→申请docx（Align2Tex2Docx）"),
+	# 后期处理流程
+	("status_proofreading", "校对中"),
+	("status_review2revise", "审查中"),
+)
+
 
 class PatentWorkflow(Document):
 	def before_insert(self):
@@ -27,23 +42,8 @@ class PatentWorkflow(Document):
 
 
 def set_current_stage(doc):
-	# Title2Scene 流程链
-	if doc.status_title2scene != "Done":
-		doc.current_stage = "专利题目→应用分析（Title2Scene）"
-	elif doc.status_scene2tech != "Done":
-		doc.current_stage = "应用分析→技术交底（Scene2Tech）"
-	# Info2Tech 流程链（可能与 Title2Scene 并行）
-	elif doc.status_info2tech != "Done":
-		doc.current_stage = "补充材料→技术交底（Info2Tech）"
-	# 两条流程交汇于 Tech2Application
-	elif doc.status_tech2application != "Done":
-		doc.current_stage = "技术交底→申请txt（Tech2Application）"
-	elif doc.status_align2tex2docx != "Done":
-		doc.current_stage = "申请txt→申请docx（Align2Tex2Docx）"
-	# 后期处理流程
-	elif doc.status_proofreading != "Done":
-		doc.current_stage = "校对中"
-	elif doc.status_review2revise != "Done":
-		doc.current_stage = "审查中"
-	else:
-		doc.current_stage = "已完成"
+	# 取第一个未完成的阶段
+	doc.current_stage = next(
+		(label for field, label in _STAGES if doc.get(field) != "Done"),
+		"已完成",
+	)
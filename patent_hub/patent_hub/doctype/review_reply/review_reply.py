@@ -9,6 +9,6 @@ from frappe.model.naming import make_autoname
 
 class ReviewReply(Document):
 	def autoname(self):
-		# 自动生成主键和 patent_id：PAT-YYYYMMDD-##
-		self.name = make_autoname("PAT-.YYYY.MM.DD.-.##")
+		# 自动生成主键和 patent_id：RR-YYYYMMDD-##（不与 Patent Workflow 的 PAT- 序列共用计数器）
+		self.name = make_autoname("RR-.YYYY.MM.DD.-.##")
 		self.patent_id = self.name
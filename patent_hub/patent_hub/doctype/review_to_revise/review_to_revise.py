@@ -6,30 +6,34 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 
+from patent_hub.api._naming import patent_id_name
+from patent_hub.api._validation import require
+
+# 审查意见 PDF 上传大小上限：10MB
+_MAX_PDF_BYTES = 10 << 20
+
 
 class ReviewToRevise(Document):
 	def before_insert(self):
-		if not self.writer_id:
-			frappe.throw(_("Writer ID is required to generate Review To Revise"))
-		if not self.patent_id:
-			frappe.throw(_("Patent ID is required to generate Review To Revise"))
-		if not self.scene_to_tech_id:
-			frappe.throw(_("Scene To Tech ID is required to generate Review To Revise"))
-		if not self.tech_to_claims_id:
-			frappe.throw(_("Tech To Claims ID is required to generate Review To Revise"))
-		if not self.claims_to_docx_id:
-			frappe.throw(_("Claims To Docx ID is required to generate Review To Revise"))
-		if not self.docx_proofreading_id:
-			frappe.throw(_("Docx Proofreading ID is required to generate Review To Revise"))
-		if not self.upload_final_docx_id:
-			frappe.throw(_("Upload Final Docx ID is required to generate Review To Revise"))
-		_patent_id = self.patent_id.split("-")
-		safe_name = _patent_id[1]
+		require(
+			self,
+			(
+				"writer_id",
+				"patent_id",
+				"scene_to_tech_id",
+				"tech_to_claims_id",
+				"claims_to_docx_id",
+				"docx_proofreading_id",
+				"upload_final_docx_id",
+			),
+		)
+		safe_name = patent_id_name(self.patent_id)
 		self.review_to_revise_id = make_autoname(f"R2R-{safe_name}-.##")
 		self.name = self.review_to_revise_id
 
 	def validate(self):
 		if self.review_pdf:
-			file_doc = frappe.get_doc("File", {"file_url": self.review_pdf})
-			if file_doc.file_size > 10 * 1024 * 1024:
+			# 只取 file_size 一列，不加载整个 File 文档
+			file_size = frappe.db.get_value("File", {"file_url": self.review_pdf}, "file_size") or 0
+			if file_size > _MAX_PDF_BYTES:
 				frappe.throw("上传的 PDF 文件不能超过 10MB，请重新上传。")
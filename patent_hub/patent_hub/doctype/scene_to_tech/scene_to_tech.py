@@ -6,14 +6,13 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 
+from patent_hub.api._naming import patent_id_name
+from patent_hub.api._validation import require
+
 
 class SceneToTech(Document):
 	def before_insert(self):
-		if not self.writer_id:
-			frappe.throw(_("Writer ID is required to generate Scene To Tech"))
-		if not self.patent_id:
-			frappe.throw(_("Patent ID is required to generate Scene To Tech"))
-		_patent_id = self.patent_id.split("-")
-		safe_name = _patent_id[1]
+		require(self, ("writer_id", "patent_id"))
+		safe_name = patent_id_name(self.patent_id)
 		self.scene_to_tech_id = make_autoname(f"S2T-{safe_name}-.##")
 		self.name = self.scene_to_tech_id
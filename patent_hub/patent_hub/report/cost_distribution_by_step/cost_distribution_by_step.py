@@ -34,19 +34,16 @@ def get_data():
 		"total_cost_review2revise": "r2r",
 	}
 
-	total_patents = frappe.db.count("Patent Workflow")
-	if total_patents == 0:
-		total_patents = 1  # 防止除以0
+	# 一次扫描同时求出各步骤的 SUM 与总数
+	cols = ", ".join(f"COALESCE(SUM(`{step}`), 0) AS `{step}`" for step in steps)
+	row = frappe.db.sql(f"SELECT {cols}, COUNT(*) AS n FROM `tabPatent Workflow`", as_dict=True)[0]
+
+	total_patents = row.n or 1  # 防止除以0
 
 	data = []
 
 	for step in steps:
-		total = (
-			frappe.db.sql(f"""
-				SELECT SUM(`{step}`) FROM `tabPatent Workflow`
-			""")[0][0]
-			or 0
-		)
+		total = row[step]
 		avg = total / total_patents
 
 		data.append(
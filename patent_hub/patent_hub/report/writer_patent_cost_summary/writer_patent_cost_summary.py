@@ -1,5 +1,6 @@
 import frappe
-from frappe.query_builder.functions import Sum
+from frappe.query_builder import Case, Order
+from frappe.query_builder.functions import Coalesce, Count, Sum
 from frappe.utils import add_days, add_months, now_datetime
 
 
@@ -55,40 +56,44 @@ def get_data():
 		PatentWorkflow.total_cost_review2revise,
 	]
 
-	all_writers = frappe.get_all("Patent Writer", fields=["name", "full_name", "creation"])
+	# 各步骤成本逐列相加（NULL 视为 0）；不用内置 sum()，避免表达式里混入常量 0
+	total = Coalesce(cost_fields[0], 0)
+	for field in cost_fields[1:]:
+		total = total + Coalesce(field, 0)
+
+	def total_since(date):
+		"""按创建时间过滤的条件聚合"""
+		return Coalesce(Sum(Case().when(PatentWorkflow.creation >= date, total).else_(0)), 0)
+
+	# 一条 GROUP BY 查询算出所有写手的各时间段合计；LEFT JOIN 保留没有 Workflow 的写手
+	rows = (
+		frappe.qb.from_(PatentWriter)
+		.left_join(PatentWorkflow)
+		.on(PatentWorkflow.writer_id == PatentWriter.name)
+		.select(
+			PatentWriter.name.as_("writer"),
+			Coalesce(Sum(total), 0).as_("total_all"),
+			total_since(one_year_ago).as_("total_year"),
+			total_since(one_quarter_ago).as_("total_quarter"),
+			total_since(one_month_ago).as_("total_month"),
+			Count(PatentWorkflow.name).as_("total_patents"),
+		)
+		.groupby(PatentWriter.name, PatentWriter.creation)
+		.orderby(PatentWriter.creation, order=Order.desc)
+	).run(as_dict=True)
 
 	data = []
 
-	for writer in all_writers:
-		writer_id = writer.name
-
-		def sum_total_cost(date_filter=None):
-			query = (
-				frappe.qb.from_(PatentWorkflow)
-				.select(Sum(sum(cost_fields)).as_("total"))
-				.where(PatentWorkflow.writer_id == writer_id)
-			)
-			if date_filter:
-				query = query.where(PatentWorkflow.creation >= date_filter)
-			result = query.run()
-			return result[0][0] or 0
-
-		total_all = sum_total_cost()
-		total_year = sum_total_cost(one_year_ago)
-		total_quarter = sum_total_cost(one_quarter_ago)
-		total_month = sum_total_cost(one_month_ago)
-
-		total_patents = frappe.db.count("Patent Workflow", filters={"writer_id": writer_id})
-		avg_cost = total_all / total_patents if total_patents else 0
+	for row in rows:
+		avg_cost = row.total_all / row.total_patents if row.total_patents else 0
 
 		data.append(
 			{
-				"writer": writer_id,
-				# "full_name": writer.full_name,
-				"total_all": total_all,
-				"total_year": total_year,
-				"total_quarter": total_quarter,
-				"total_month": total_month,
+				"writer": row.writer,
+				"total_all": row.total_all,
+				"total_year": row.total_year,
+				"total_quarter": row.total_quarter,
+				"total_month": row.total_month,
 				"avg_cost": avg_cost,
 			}
 		)